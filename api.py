@@ -0,0 +1,191 @@
+# HTTP API for resume extraction, company research and message generation,
+# built on the same helpers as the Streamlit app and the batch runner.
+#
+#   uvicorn api:app --host 0.0.0.0 --port 8000
+#
+# The blocking helpers run on one shared worker pool. Identical lookups that
+# are in flight at the same time are coalesced: concurrent requests for the
+# same company, the same resume or the same generation prompt share a single
+# upstream call and all receive its result.
+import os
+import base64
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from cache import normalize_company_name
+from core import (
+    RESUME_FILE_TYPES,
+    _resume_hash,
+    extract_resume_info_llm,
+    research_company,
+    company_context,
+    build_generation_request,
+    generate_from_request
+)
+from ingestion import extract_text, ResumeIngestionError
+from metrics import start_trace, record, render_prometheus
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("API_MAX_WORKERS", "16")), thread_name_prefix="api")
+
+
+class Singleflight:
+    def __init__(self):
+        self._calls = {}
+
+    # Run fn(*args) on the worker pool, or join the call already in flight for `key`
+    async def do(self, key, fn, *args):
+        future = self._calls.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(_executor, fn, *args)
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._calls.pop(key, None) if self._calls.get(key) is f else None)
+        else:
+            record("api_coalesced", kind=key[0])
+        # A client disconnecting must not cancel the call for everyone else waiting on it
+        return await asyncio.shield(future)
+
+
+_flights = Singleflight()
+
+app = FastAPI(title="OutReachCrafter API")
+
+
+class ResumeRequest(BaseModel):
+    resume_text: str | None = None
+    file: str | None = Field(None, description="Base64-encoded PDF, DOCX or TXT file")
+    file_type: str | None = Field(None, description="MIME type or extension (pdf, docx, txt) of `file`")
+
+
+class ResearchRequest(BaseModel):
+    company_name: str
+
+
+class PlatformOptions(BaseModel):
+    max_length: int | None = Field(None, ge=1, description="Character limit for each variant")
+    use_emojis: bool | None = None
+
+
+class GenerateRequest(BaseModel):
+    company_name: str
+    job_title: str
+    platforms: list[str] = ["Email"]
+    resume: dict | None = Field(None, description="Structured resume as returned by /resume/extract")
+    resume_text: str | None = None
+    file: str | None = None
+    file_type: str | None = None
+    tone: str = "formal"
+    length: str = "medium"
+    platform_options: dict[str, PlatformOptions] = {}
+    focus_areas: list[str] = ["skills", "experience"]
+    num_variants: int = Field(1, ge=1, le=3)
+    force_regenerate: bool = False
+
+
+def _traced(name, fn, *args):
+    with start_trace(name):
+        return fn(*args)
+
+
+def _decode_file(body):
+    file_type = RESUME_FILE_TYPES.get("." + (body.file_type or "").lower().lstrip("."), body.file_type)
+    try:
+        data = base64.b64decode(body.file, validate=True)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="`file` is not valid base64.")
+    return data, file_type
+
+
+async def _resume_text(body):
+    if body.resume_text:
+        return body.resume_text
+    if not body.file:
+        raise HTTPException(status_code=400, detail="Provide `resume_text` or `file`.")
+    data, file_type = _decode_file(body)
+    try:
+        return await _flights.do(("file", hashlib.sha256(data).hexdigest(), file_type), extract_text, data, file_type)
+    except ResumeIngestionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _structured_resume(resume_text):
+    result = await _flights.do(("resume", _resume_hash(resume_text)), _traced, "api_resume", extract_resume_info_llm, resume_text)
+    if "error" in result:
+        raise HTTPException(status_code=502, detail=result["error"])
+    return result
+
+
+async def _research(company_name):
+    key = normalize_company_name(company_name)
+    if not key:
+        raise HTTPException(status_code=400, detail="`company_name` is required.")
+    return await _flights.do(("research", key), _traced, "api_research", research_company, company_name)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_prometheus()
+
+
+@app.post("/resume/extract")
+async def resume_extract(body: ResumeRequest):
+    resume_text = await _resume_text(body)
+    return {"resume_text": resume_text, "resume": await _structured_resume(resume_text)}
+
+
+@app.post("/research")
+async def research(body: ResearchRequest):
+    result = await _research(body.company_name)
+    error = result.get("overview", {}).get("error")
+    if error:
+        raise HTTPException(status_code=502, detail=error)
+    return dict(company_context(result), raw=result)
+
+
+@app.post("/generate")
+async def generate(body: GenerateRequest):
+    if body.resume is None:
+        resume_structured = await _structured_resume(await _resume_text(body))
+    else:
+        resume_structured = body.resume
+    research_result = await _research(body.company_name)
+    context = company_context(research_result)
+    loop = asyncio.get_running_loop()
+
+    async def one(platform):
+        request = await loop.run_in_executor(
+            _executor,
+            build_generation_request,
+            resume_structured,
+            body.company_name,
+            context["company_description"],
+            body.tone,
+            body.length,
+            body.job_title,
+            platform,
+            body.platform_options.get(platform, PlatformOptions()).model_dump(exclude_none=True),
+            body.focus_areas,
+            body.num_variants,
+            context["company_projects"],
+            context["company_vmg"]
+        )
+        if "error" in request:
+            return request
+        if body.force_regenerate:
+            return await loop.run_in_executor(_executor, _traced, "api_generate", generate_from_request, request, True)
+        return await _flights.do(("generate", request["cache_key"]), _traced, "api_generate", generate_from_request, request)
+
+    platforms = list(dict.fromkeys(body.platforms))
+    results = await asyncio.gather(*(one(platform) for platform in platforms))
+    return {
+        "company_error": research_result.get("overview", {}).get("error"),
+        "results": dict(zip(platforms, results))
+    }
@@ -0,0 +1,244 @@
+# Headless batch runner: generates outreach messages for a CSV/JSONL file of
+# candidate x company x job_title x platform rows.
+#
+#   python batch.py jobs.csv -o results.jsonl --workers 4
+#
+# Each input row needs `company_name`, `job_title`, `platform` and one of
+# `resume` (path to a PDF/DOCX/TXT file), `resume_text` or `resume_json`.
+# Optional columns: `id`, `tone`, `length`, `focus_areas` (comma-separated),
+# `num_variants`, `max_length`, `use_emojis`.
+#
+# Results are appended to the output JSONL as rows finish. The output file is
+# also the checkpoint: rerunning with the same output skips rows already
+# written with status "ok", so an interrupted run resumes where it stopped.
+import os
+import sys
+import csv
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import normalize_company_name
+from metrics import start_trace, start_metrics_server
+from core import (
+    RESUME_FILE_TYPES,
+    extract_resume_text,
+    extract_resume_info_llm,
+    research_company,
+    company_context,
+    validate_generation_options,
+    generate_platform_message
+)
+
+
+# Computes each key once; concurrent callers for the same key wait for the first.
+# Values rejected by `keep` are handed to those waiters but not stored, so later callers retry.
+class _Memo:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key, compute, keep=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = {"done": threading.Event(), "value": None}
+        if owner:
+            try:
+                entry["value"] = compute()
+            except Exception as e:
+                entry["value"] = {"error": str(e)}
+            finally:
+                if keep is not None and not keep(entry["value"]):
+                    with self._lock:
+                        self._entries.pop(key, None)
+                entry["done"].set()
+        else:
+            entry["done"].wait()
+        return entry["value"]
+
+
+def load_jobs(input_path):
+    if input_path.lower().endswith(".jsonl"):
+        with open(input_path, encoding="utf-8") as f:
+            for idx, line in enumerate(f, start=1):
+                if line.strip():
+                    row = json.loads(line)
+                    row.setdefault("id", str(idx))
+                    yield row
+    else:
+        with open(input_path, newline="", encoding="utf-8") as f:
+            for idx, row in enumerate(csv.DictReader(f), start=1):
+                row = {k: v for k, v in row.items() if v not in (None, "")}
+                row.setdefault("id", str(idx))
+                yield row
+
+
+def completed_row_ids(output_path):
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            if record.get("status") == "ok":
+                done.add(str(record.get("id")))
+    return done
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _is_error(value):
+    return isinstance(value, dict) and "error" in value
+
+
+# research_company reports failures in "overview"; _Memo reports exceptions at the top level
+def _research_error(research):
+    return research.get("error") or research.get("overview", {}).get("error")
+
+
+class BatchRunner:
+    def __init__(self, output_path, workers=4, defaults=None, force_regenerate=False):
+        self.output_path = output_path
+        self.force_regenerate = force_regenerate
+        self.workers = workers
+        self.defaults = defaults or {}
+        self.research = _Memo()
+        self.resumes = _Memo()
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+        self._write_lock = threading.Lock()
+
+    def _resume_structured(self, row):
+        if row.get("resume_json"):
+            value = row["resume_json"]
+            return json.loads(value) if isinstance(value, str) else value
+        if row.get("resume_text"):
+            resume_text = row["resume_text"]
+            return self.resumes.get(("text", resume_text), lambda: extract_resume_info_llm(resume_text), keep=lambda value: not _is_error(value))
+        path = row.get("resume")
+        if not path:
+            return {"error": "Row has no resume, resume_text or resume_json column."}
+
+        def compute():
+            file_type = RESUME_FILE_TYPES.get(os.path.splitext(path)[1].lower())
+            if not file_type:
+                return {"error": f"Unsupported resume file type: {path}"}
+            with open(path, "rb") as f:
+                resume_text = extract_resume_text(f, file_type)
+            return extract_resume_info_llm(resume_text)
+        return self.resumes.get(("path", os.path.abspath(path)), compute, keep=lambda value: not _is_error(value))
+
+    def run_row(self, row):
+        options = dict(self.defaults, **row)
+        platform = options.get("platform", "")
+        tone = options.get("tone", "formal")
+        length = options.get("length", "medium")
+        company_name = options.get("company_name", "")
+        record = {"id": str(row["id"]), "company_name": company_name, "job_title": options.get("job_title", ""), "platform": platform}
+        # Reject bad options before spending resume extraction or research calls on the row
+        invalid = validate_generation_options(tone, length, platform)
+        if invalid:
+            return dict(record, status="error", error=invalid)
+        num_variants = int(options.get("num_variants", 1))
+        platform_options = {}
+        if options.get("max_length"):
+            platform_options["max_length"] = int(options["max_length"])
+        if "use_emojis" in options:
+            platform_options["use_emojis"] = _parse_bool(options["use_emojis"])
+        focus_areas = options.get("focus_areas", ["skills", "experience"])
+        if isinstance(focus_areas, str):
+            focus_areas = [f.strip() for f in focus_areas.split(",") if f.strip()]
+        resume_structured = self._resume_structured(row)
+        if _is_error(resume_structured):
+            return dict(record, status="error", error=resume_structured["error"])
+        # Companies shared across rows are researched once per run
+        research = self.research.get(
+            normalize_company_name(company_name),
+            lambda: research_company(company_name),
+            keep=lambda value: not _research_error(value)
+        )
+        # Without company context the row is not done; leave it to the checkpoint to retry
+        company_error = _research_error(research)
+        if company_error:
+            return dict(record, status="error", error=f"Company research failed: {company_error}")
+        result = generate_platform_message(
+            resume_structured,
+            company_name,
+            platform=platform,
+            platform_options=platform_options,
+            tone=tone,
+            length=length,
+            job_title=options.get("job_title", ""),
+            focus_areas=focus_areas,
+            num_variants=num_variants,
+            force_regenerate=self.force_regenerate,
+            **company_context(research)
+        )
+        if "error" in result:
+            return dict(record, status="error", error=result["error"])
+        return dict(record, status="ok", messages=result["messages"], prompt_tokens=result.get("prompt_tokens"))
+
+    def _run_and_write(self, row, out, slots):
+        try:
+            with start_trace("batch_row") as trace:
+                try:
+                    record = self.run_row(row)
+                except Exception as e:
+                    record = {"id": str(row["id"]), "status": "error", "error": str(e)}
+            record.update(trace_id=trace.id, duration_ms=trace.duration_ms)
+            with self._write_lock:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                self.counts[record["status"]] += 1
+        finally:
+            slots.release()
+
+    def run(self, jobs):
+        done = completed_row_ids(self.output_path)
+        # Bound the rows in flight so huge inputs are streamed rather than queued up front
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        with open(self.output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as executor:
+            for row in jobs:
+                if str(row["id"]) in done:
+                    self.counts["skipped"] += 1
+                    continue
+                slots.acquire()
+                executor.submit(self._run_and_write, row, out, slots)
+        return self.counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate outreach messages for a CSV/JSONL file of jobs.")
+    parser.add_argument("input", help="CSV or JSONL file of jobs")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to (also used as the checkpoint)")
+    parser.add_argument("--workers", type=int, default=4, help="Rows processed concurrently (default: 4)")
+    parser.add_argument("--tone", default="formal", choices=["formal", "enthusiastic", "conversational"])
+    parser.add_argument("--length", default="medium", choices=["short", "medium", "long"])
+    parser.add_argument("--focus-areas", default="skills,experience", help="Comma-separated focus areas")
+    parser.add_argument("--num-variants", type=int, default=1)
+    parser.add_argument("--force-regenerate", action="store_true", help="Bypass the generation cache")
+    args = parser.parse_args(argv)
+    defaults = {
+        "tone": args.tone,
+        "length": args.length,
+        "focus_areas": args.focus_areas,
+        "num_variants": args.num_variants
+    }
+    start_metrics_server()
+    runner = BatchRunner(args.output, workers=max(1, args.workers), defaults=defaults, force_regenerate=args.force_regenerate)
+    counts = runner.run(load_jobs(args.input))
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already completed", file=sys.stderr)
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
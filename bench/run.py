@@ -0,0 +1,204 @@
+# Offline benchmark: drives resume extraction, Tavily search, company research
+# and message generation end to end against local Groq/Tavily stubs and reports
+# p50/p95/p99 latency, throughput and token usage per stage.
+#
+#   python -m bench.run --iterations 50 --concurrency 8
+#   python -m bench.run --compare bench/results/20261017-120000.json
+#
+# Results are written to bench/results/ as JSON so runs can be compared.
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from bench.stubs import StubConfig, GroqStub, TavilyStub
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+RESUME_TEXT = """Jane Doe
+Software Engineer at Example Corp (2020-2024): built data pipelines in Python.
+BSc Computer Science, Example University (2016-2020).
+Skills: Python, SQL, distributed systems."""
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest rank: the smallest sample with at least pct% of samples at or below it
+    return ordered[max(0, math.ceil(pct * len(ordered) / 100) - 1)]
+
+
+def _failed(result):
+    return (isinstance(result, dict) and "error" in result) or result in ([], None)
+
+
+def run_stage(name, call, iterations, concurrency, groq, tavily):
+    before_groq, before_tavily = groq.snapshot(), tavily.snapshot()
+    latencies = []
+    errors = 0
+
+    def timed(i):
+        started = time.perf_counter()
+        result = call(i)
+        return time.perf_counter() - started, _failed(result)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, failed in executor.map(timed, range(iterations)):
+            latencies.append(latency * 1000)
+            errors += failed
+    wall = time.perf_counter() - started
+    after_groq, after_tavily = groq.snapshot(), tavily.snapshot()
+    return {
+        "stage": name,
+        "calls": iterations,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "throughput_per_s": round(iterations / wall, 2) if wall else 0.0,
+        "prompt_tokens": after_groq["prompt_tokens"] - before_groq["prompt_tokens"],
+        "completion_tokens": after_groq["completion_tokens"] - before_groq["completion_tokens"],
+        "groq_requests": after_groq["requests"] - before_groq["requests"],
+        "tavily_requests": after_tavily["requests"] - before_tavily["requests"],
+        "upstream_rate_limited": (after_groq["rate_limited"] - before_groq["rate_limited"]) + (after_tavily["rate_limited"] - before_tavily["rate_limited"])
+    }
+
+
+def run_benchmark(args):
+    model_latency = dict((m, float(ms)) for m, ms in (item.split("=", 1) for item in args.groq_model_latency))
+    groq = GroqStub(StubConfig(args.groq_latency_ms, args.groq_jitter_ms, args.groq_error_rate, args.groq_rpm, args.seed, model_latency)).start()
+    tavily = TavilyStub(StubConfig(args.tavily_latency_ms, args.tavily_jitter_ms, args.tavily_error_rate, args.tavily_rpm, args.seed)).start()
+    cache_dir = tempfile.mkdtemp(prefix="outreach-bench-")
+    # Point the app at the stubs before core is imported; a fresh cache file keeps runs independent
+    os.environ.update({
+        "GROQ_API_KEY": "bench",
+        "TAVILY_API_KEY": "bench",
+        "GROQ_API_BASE": groq.url,
+        "TAVILY_API_BASE": tavily.url,
+        "OUTREACH_CACHE_PATH": os.path.join(cache_dir, "cache.sqlite3"),
+        "COMPANY_STORE_PATH": os.path.join(cache_dir, "company_profiles.sqlite3"),
+        "GROQ_BACKOFF_BASE": str(args.backoff_base)
+    })
+    os.environ.setdefault("GROQ_RPM_LIMIT", "0")
+    os.environ.setdefault("GROQ_TPM_LIMIT", "0")
+    import core
+    import routing
+
+    # Unique inputs per call measure the uncached path; --warm reuses one input so caches are exercised
+    def key(i):
+        return 0 if args.warm else i
+
+    stages = [
+        ("resume_extraction", lambda i: core.extract_resume_info_llm(f"{RESUME_TEXT}\nRef {key(i)}")),
+        ("tavily_search", lambda i: core._tavily_search(f"Company {key(i)}", [f"Company {key(i)} ongoing projects", f"Company {key(i)} past projects"])),
+        ("research", lambda i: core.research_company(f"Research Co {key(i)}")),
+        ("generation", lambda i: core.generate_platform_message(
+            {"skills": ["Python", "SQL"], "experience": [{"company": "Example Corp", "title": "Engineer"}]},
+            f"Company {key(i)}",
+            "A company building data products.",
+            "formal",
+            "medium",
+            "Software Engineer",
+            args.platform,
+            {},
+            ["skills", "experience"],
+            2,
+            company_projects=[f"Company {key(i)} is building a streaming analytics platform."],
+            company_vmg=["Mission: make data useful for everyone."]
+        ))
+    ]
+    selected = [s for s in stages if not args.stages or s[0] in args.stages]
+    try:
+        results = [run_stage(name, call, args.iterations, args.concurrency, groq, tavily) for name, call in selected]
+    finally:
+        groq.stop()
+        tavily.stop()
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "stages": results,
+        "models": routing.get_latency_tracker().stats()
+    }
+
+
+def print_report(report, baseline=None):
+    base = {s["stage"]: s for s in baseline["stages"]} if baseline else {}
+    header = f"{'stage':<18}{'calls':>7}{'errors':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'prompt tok':>12}{'compl tok':>11}"
+    print(header)
+    for s in report["stages"]:
+        print(f"{s['stage']:<18}{s['calls']:>7}{s['errors']:>7}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['throughput_per_s']:>9}{s['prompt_tokens']:>12}{s['completion_tokens']:>11}")
+        if s["stage"] in base:
+            b = base[s["stage"]]
+            deltas = []
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_per_s", "prompt_tokens"):
+                if b[metric]:
+                    deltas.append(f"{metric} {100 * (s[metric] - b[metric]) / b[metric]:+.1f}%")
+            print(f"{'':<18}vs baseline: " + ", ".join(deltas))
+    for model, stats in report.get("models", {}).items():
+        print(f"model {model}: {stats['samples']} calls, rolling p95 {stats['p95_s']} s")
+
+
+# Stages whose p95 latency grew, or throughput dropped, by more than `threshold` percent
+def find_regressions(report, baseline, threshold):
+    base = {s["stage"]: s for s in baseline["stages"]}
+    regressions = []
+    for s in report["stages"]:
+        b = base.get(s["stage"])
+        if not b:
+            continue
+        if b["p95_ms"] and (s["p95_ms"] - b["p95_ms"]) / b["p95_ms"] * 100 > threshold:
+            regressions.append(f"{s['stage']}: p95 {b['p95_ms']} -> {s['p95_ms']} ms")
+        if b["throughput_per_s"] and (b["throughput_per_s"] - s["throughput_per_s"]) / b["throughput_per_s"] * 100 > threshold:
+            regressions.append(f"{s['stage']}: throughput {b['throughput_per_s']} -> {s['throughput_per_s']} req/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OutreachCrafter against local Groq/Tavily stubs.")
+    parser.add_argument("--iterations", type=int, default=20, help="Calls per stage (default: 20)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent calls per stage (default: 4)")
+    parser.add_argument("--stages", nargs="*", choices=["resume_extraction", "tavily_search", "research", "generation"], help="Stages to run (default: all)")
+    parser.add_argument("--platform", default="Email", help="Platform used by the generation stage")
+    parser.add_argument("--warm", action="store_true", help="Reuse one input per stage so caches are hit")
+    parser.add_argument("--groq-latency-ms", type=float, default=400)
+    parser.add_argument("--groq-jitter-ms", type=float, default=100)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0, help="Fraction of Groq requests answered with 503")
+    parser.add_argument("--groq-rpm", type=int, default=0, help="Stub Groq requests-per-minute limit; 0 disables")
+    parser.add_argument("--groq-model-latency", action="append", default=[], metavar="MODEL=MS", help="Stub latency for one model, e.g. to exercise routing fallback and hedging")
+    parser.add_argument("--tavily-latency-ms", type=float, default=300)
+    parser.add_argument("--tavily-jitter-ms", type=float, default=100)
+    parser.add_argument("--tavily-error-rate", type=float, default=0.0)
+    parser.add_argument("--tavily-rpm", type=int, default=0)
+    parser.add_argument("--backoff-base", type=float, default=0.1, help="GROQ_BACKOFF_BASE used during the run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Result file (default: bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline result file to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=10.0, help="Percent change treated as a regression (default: 10)")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+    if baseline:
+        regressions = find_regressions(report, baseline, args.regression_threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
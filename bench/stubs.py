@@ -0,0 +1,199 @@
+# Local stand-ins for the Groq and Tavily HTTP APIs used by the benchmark.
+# Latency, rate limits and error rates are configurable so client-side
+# caching, concurrency and retry changes can be measured without API quota.
+import json
+import time
+import random
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RESUME_JSON = {
+    "skills": ["Python", "SQL", "Distributed systems"],
+    "experience": [{"company": "Example Corp", "title": "Software Engineer", "dates": "2020-2024", "description": "Built data pipelines."}],
+    "education": [{"degree": "BSc Computer Science", "institution": "Example University", "dates": "2016-2020"}],
+    "achievements": ["Led migration to streaming ingestion"],
+    "projects": ["Open-source job scheduler"]
+}
+
+MESSAGE_VARIANT = (
+    "Hi team, I'm excited to apply for this role. My background in Python and distributed systems "
+    "matches your ongoing platform work, and I'd love to help deliver on your mission."
+)
+
+# Answer to the short-form repair prompt sent for over-length variants
+REPAIRED_VARIANT = "Hi team, my Python and distributed systems background fits your platform work. Open to a quick chat?"
+
+
+class StubConfig:
+    def __init__(self, latency_ms=200, jitter_ms=50, error_rate=0.0, rpm=0, seed=None, model_latency_ms=None):
+        self.latency_ms = latency_ms
+        # Per-model overrides of latency_ms (Groq stub only)
+        self.model_latency_ms = model_latency_ms or {}
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.random = random.Random(seed)
+
+
+class StubServer:
+    def __init__(self, config=None):
+        self.config = config or StubConfig()
+        self.stats = {"requests": 0, "rate_limited": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub._handle(self, body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    # Returns an (status, message) error to send instead of a normal response, or None
+    def _admit(self, latency_ms=None):
+        config = self.config
+        now = time.monotonic()
+        with self._lock:
+            self.stats["requests"] += 1
+            if config.rpm:
+                while self._window and now - self._window[0] > 60:
+                    self._window.popleft()
+                if len(self._window) >= config.rpm:
+                    self.stats["rate_limited"] += 1
+                    return 429, "Rate limit reached"
+                self._window.append(now)
+            fail = config.random.random() < config.error_rate
+            if latency_ms is None:
+                latency_ms = config.latency_ms
+            delay = max(0.0, latency_ms + config.random.uniform(-config.jitter_ms, config.jitter_ms)) / 1000
+        time.sleep(delay)
+        if fail:
+            self._count("errors")
+            return 503, "Service unavailable"
+        return None
+
+    def _send_json(self, handler, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _handle(self, handler, body):
+        raise NotImplementedError
+
+
+class GroqStub(StubServer):
+    # Serves the OpenAI-compatible chat completions endpoint used by ChatGroq
+    def _handle(self, handler, body):
+        rejected = self._admit(self.config.model_latency_ms.get(body.get("model")))
+        if rejected:
+            status, message = rejected
+            headers = {"retry-after": "1"} if status == 429 else None
+            return self._send_json(handler, status, {"error": {"message": message, "type": "stub_error"}}, headers)
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        if "resume parser" in prompt:
+            text = json.dumps(RESUME_JSON)
+        elif prompt.startswith("Rewrite this"):
+            text = REPAIRED_VARIANT
+        else:
+            text = "\n---\n".join([MESSAGE_VARIANT] * 2)
+        usage = {
+            "prompt_tokens": max(1, len(prompt) // 4),
+            "completion_tokens": max(1, len(text) // 4)
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self._count("prompt_tokens", usage["prompt_tokens"])
+        self._count("completion_tokens", usage["completion_tokens"])
+        model = body.get("model", "stub")
+        if body.get("stream"):
+            return self._stream(handler, model, text, usage)
+        self._send_json(handler, 200, {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    def _stream(self, handler, model, text, usage):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        words = text.split(" ")
+        for idx, word in enumerate(words):
+            chunk = {
+                "id": "stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if idx == 0 else " " + word}, "finish_reason": None}]
+            }
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        final = {
+            "id": "stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "x_groq": {"usage": usage}
+        }
+        handler.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        handler.wfile.flush()
+        handler.close_connection = True
+
+
+class TavilyStub(StubServer):
+    # Serves the Tavily /search endpoint
+    def _handle(self, handler, body):
+        rejected = self._admit()
+        if rejected:
+            status, message = rejected
+            return self._send_json(handler, status, {"detail": {"error": message}})
+        query = body.get("query", "")
+        results = [
+            {
+                "title": f"{query} result {i}",
+                "url": f"https://example.com/{i}",
+                "content": f"<p>{query}: snippet {i} describing the company's projects, mission &amp; goals.</p>",
+                "score": 1.0 - i / 10
+            }
+            for i in range(int(body.get("max_results", 3)))
+        ]
+        self._send_json(handler, 200, {"query": query, "results": results, "response_time": self.config.latency_ms / 1000})
@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from metrics import record
+
+# Process-wide, disk-backed key/value cache with TTL expiry and LRU eviction.
+# Every named cache is its own table in one SQLite file, so research results,
+# LLM extractions, etc. survive browser sessions and Streamlit restarts.
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "outreach_cache.sqlite3")
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def make_cache_key(*parts):
+    # Stable hash of any JSON-serializable parts
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def normalize_company_name(company_name):
+    return " ".join((company_name or "").split()).lower()
+
+
+class PersistentCache:
+    def __init__(self, name, path=None, ttl=86400, max_entries=5000):
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+            raise ValueError(f"Invalid cache name: {name}")
+        self.name = name
+        self.path = path or os.getenv("OUTREACH_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.name} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.name}_accessed ON {self.name} (accessed_at)")
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(f"SELECT value, created_at FROM {self.name} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                record("cache_misses", cache=self.name)
+                return default
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+                self.misses += 1
+                record("cache_misses", cache=self.name)
+                return default
+            self._conn.execute(f"UPDATE {self.name} SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        record("cache_hits", cache=self.name)
+        return json.loads(value)
+
+    def set(self, key, value):
+        now = time.time()
+        payload = json.dumps(value)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now)
+            )
+            if self.max_entries:
+                count = self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+                if count > self.max_entries:
+                    # Evict the least recently used entries beyond the size bound
+                    cur = self._conn.execute(
+                        f"DELETE FROM {self.name} WHERE key IN "
+                        f"(SELECT key FROM {self.name} ORDER BY accessed_at ASC LIMIT ?)",
+                        (count - self.max_entries,)
+                    )
+                    self.evictions += cur.rowcount
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.name} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.name}")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "ttl": self.ttl,
+            "max_entries": self.max_entries
+        }
+
+
+# Shared cache instance per name, created on first use
+def get_cache(name, ttl=86400, max_entries=5000):
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = PersistentCache(name, ttl=ttl, max_entries=max_entries)
+        return _caches[name]
+
+
+def cache_stats():
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {c.name: c.stats() for c in caches}
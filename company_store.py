@@ -0,0 +1,235 @@
+# Local company profile store: description, projects and vision/mission/goals
+# per company in SQLite, with an FTS5 full-text index. Company research reads
+# it before going to Tavily and saves every complete research result, so
+# known companies are served in milliseconds and without network access.
+# Profiles captured from research expire with the research cache TTL;
+# imported and warmed profiles are kept until replaced.
+#
+#   python company_store.py import profiles.jsonl
+#   python company_store.py export profiles.jsonl
+#   python company_store.py warm companies.txt --workers 4
+#   python company_store.py search "payments infrastructure"
+#
+# JSONL records look like {"name": ..., "description": ..., "projects": [...],
+# "vmg": [...], "overview": [{"title", "snippet", "link"}, ...]}; only `name`
+# is required.
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import normalize_company_name
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "company_profiles.sqlite3")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class CompanyStore:
+    def __init__(self, path=None, max_age=None):
+        self.path = path or os.getenv("COMPANY_STORE_PATH", DEFAULT_STORE_PATH)
+        # Seconds after which an imported or warmed profile is ignored by lookups; 0 keeps them forever
+        self.max_age = int(os.getenv("COMPANY_PROFILE_MAX_AGE", "0")) if max_age is None else max_age
+        # Profiles saved from live research go stale on the same schedule as the research cache
+        self.research_ttl = int(os.getenv("RESEARCH_CACHE_TTL", "86400"))
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS companies ("
+                "key TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT NOT NULL, "
+                "overview TEXT NOT NULL, projects TEXT NOT NULL, vmg TEXT NOT NULL, "
+                "source TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5("
+                "key UNINDEXED, name, description, projects, vmg, tokenize='porter unicode61')"
+            )
+
+    def _row_to_profile(self, row):
+        key, name, description, overview, projects, vmg, source, updated_at = row
+        return {
+            "key": key,
+            "name": name,
+            "description": description,
+            "overview": json.loads(overview),
+            "projects": json.loads(projects),
+            "vmg": json.loads(vmg),
+            "source": source,
+            "updated_at": updated_at
+        }
+
+    def get(self, company_name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, name, description, overview, projects, vmg, source, updated_at FROM companies WHERE key = ?",
+                (normalize_company_name(company_name),)
+            ).fetchone()
+        if row is None:
+            return None
+        profile = self._row_to_profile(row)
+        max_age = self.research_ttl if profile["source"] == "research" else self.max_age
+        if max_age and time.time() - profile["updated_at"] > max_age:
+            return None
+        return profile
+
+    def put(self, company_name, description="", overview=None, projects=None, vmg=None, source="research", updated_at=None):
+        key = normalize_company_name(company_name)
+        if not key:
+            raise ValueError("Company name is required.")
+        overview = overview or ([{"title": company_name, "snippet": description, "link": ""}] if description else [])
+        description = description or (overview[0].get("snippet") or "" if overview else "")
+        projects = projects or []
+        vmg = vmg or []
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO companies (key, name, description, overview, projects, vmg, source, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, company_name, description, json.dumps(overview), json.dumps(projects), json.dumps(vmg), source, updated_at or time.time())
+            )
+            self._conn.execute("DELETE FROM companies_fts WHERE key = ?", (key,))
+            self._conn.execute(
+                "INSERT INTO companies_fts (key, name, description, projects, vmg) VALUES (?, ?, ?, ?, ?)",
+                (key, company_name, description, "\n".join(projects), "\n".join(vmg))
+            )
+
+    # Save a complete research_company result; partial or failed research is not stored
+    def put_research(self, company_name, research, source="research"):
+        overview = research.get("overview", {})
+        if overview.get("error") or not overview.get("results") or not research.get("projects") or not research.get("vmg"):
+            return False
+        self.put(company_name, overview=overview["results"], projects=research["projects"], vmg=research["vmg"], source=source)
+        return True
+
+    def delete(self, company_name):
+        key = normalize_company_name(company_name)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM companies WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM companies_fts WHERE key = ?", (key,))
+
+    # Full-text search over names, descriptions, projects and vision/mission/goals, best matches first
+    def search(self, query, limit=10):
+        # Quote each term so user input is never parsed as FTS5 query syntax
+        terms = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        if not terms:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.key, c.name, c.description, c.overview, c.projects, c.vmg, c.source, c.updated_at "
+                "FROM companies_fts f JOIN companies c ON c.key = f.key "
+                "WHERE companies_fts MATCH ? ORDER BY bm25(companies_fts) LIMIT ?",
+                (terms, limit)
+            ).fetchall()
+        return [self._row_to_profile(row) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def import_jsonl(self, path):
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self.put(
+                    record["name"],
+                    description=record.get("description", ""),
+                    overview=record.get("overview"),
+                    projects=record.get("projects"),
+                    vmg=record.get("vmg"),
+                    source=record.get("source", "import"),
+                    updated_at=record.get("updated_at")
+                )
+                count += 1
+        return count
+
+    def export_jsonl(self, path):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, name, description, overview, projects, vmg, source, updated_at FROM companies ORDER BY key"
+            ).fetchall()
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                profile = self._row_to_profile(row)
+                del profile["key"]
+                f.write(json.dumps(profile) + "\n")
+        return len(rows)
+
+
+# A stored profile in the shape returned by core.research_company
+def profile_to_research(profile):
+    return {"overview": {"results": profile["overview"]}, "projects": profile["projects"], "vmg": profile["vmg"]}
+
+
+def store_enabled():
+    return os.getenv("COMPANY_STORE", "1").lower() not in ("0", "false", "no")
+
+
+# Shared store for the process, created on first use
+def get_company_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CompanyStore()
+        return _store
+
+
+# Research every company without a permanent profile and keep the results as
+# warmed profiles, which do not expire with the research TTL; returns (stored, failed) names
+def warm(company_names, workers=4):
+    from core import research_company
+    store = get_company_store()
+    names = []
+    for name in dict.fromkeys(n.strip() for n in company_names):
+        profile = store.get(name) if name else None
+        if name and (profile is None or profile["source"] == "research"):
+            names.append(name)
+    stored, failed = [], []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="warm") as executor:
+        for name, research in zip(names, executor.map(research_company, names)):
+            (stored if store.put_research(name, research, source="warm") else failed).append(name)
+    return stored, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local company profile store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("import", help="Load profiles from a JSONL file").add_argument("path")
+    commands.add_parser("export", help="Write all profiles to a JSONL file").add_argument("path")
+    warm_parser = commands.add_parser("warm", help="Research and store a list of companies (one name per line)")
+    warm_parser.add_argument("path")
+    warm_parser.add_argument("--workers", type=int, default=4, help="Companies researched concurrently (default: 4)")
+    search_parser = commands.add_parser("search", help="Full-text search over stored profiles")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    store = get_company_store()
+    if args.command == "import":
+        print(f"Imported {store.import_jsonl(args.path)} profiles ({len(store)} in store)", file=sys.stderr)
+    elif args.command == "export":
+        print(f"Exported {store.export_jsonl(args.path)} profiles to {args.path}", file=sys.stderr)
+    elif args.command == "warm":
+        with open(args.path, encoding="utf-8") as f:
+            stored, failed = warm(f.read().splitlines(), workers=args.workers)
+        for name in failed:
+            print(f"Could not research {name}", file=sys.stderr)
+        print(f"Stored {len(stored)} new profiles, {len(failed)} failed ({len(store)} in store)", file=sys.stderr)
+        return 1 if failed else 0
+    elif args.command == "search":
+        for profile in store.search(args.query, limit=args.limit):
+            print(f"{profile['name']}: {profile['description'][:120]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,577 @@
+# Streamlit-free core of OutreachCrafter: resume extraction, company research and
+# message generation. Imported by the UI (app.py) and the batch CLI (batch.py).
+# langchain, requests and tavily are imported where first needed rather than at
+# module level, so app startup does not pay for them before any stage runs.
+import os
+import json
+import hashlib
+import functools
+from dotenv import load_dotenv
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import re
+from html import unescape
+from cache import get_cache, make_cache_key, normalize_company_name
+from llm_client import call_llm, default_model_name
+from routing import route_for, call_routed, stream_routed
+from prompt_builder import build_generation_prompt, generation_prompt
+from ingestion import extract_text, PDF_TYPE, DOCX_TYPE, TXT_TYPE
+from metrics import span, traced, submit, record
+from company_store import get_company_store, store_enabled, profile_to_research
+from validation import platform_rules, enforce
+
+load_dotenv()
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Variants are separated by lines that are exactly three dashes
+_VARIANT_SEPARATOR_RE = re.compile(r'^---$', re.MULTILINE)
+_TEMPLATE_VAR_RE = re.compile(r'\{(\w+)\}')
+# Markdown code fence around a model's JSON answer, e.g. ```json ... ```
+_CODE_FENCE_RE = re.compile(r'^\s*```[\w-]*\s*\n(.*?)\n?\s*```\s*$', re.DOTALL)
+
+
+# Shared on-disk cache for Tavily company research, reused across sessions
+def _research_cache():
+    return get_cache(
+        "company_research",
+        ttl=int(os.getenv("RESEARCH_CACHE_TTL", "86400")),
+        max_entries=int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "5000"))
+    )
+
+def _research_cache_key(kind, company_name, queries, limit):
+    return make_cache_key(kind, normalize_company_name(company_name), [normalize_company_name(q) for q in queries], limit)
+
+
+# Bump when the resume extraction prompt changes so stale cached extractions are not reused
+RESUME_PROMPT_VERSION = "1"
+
+def _resume_cache():
+    return get_cache(
+        "resume_extraction",
+        ttl=int(os.getenv("RESUME_CACHE_TTL", "2592000")),
+        max_entries=int(os.getenv("RESUME_CACHE_MAX_ENTRIES", "2000"))
+    )
+
+# Normalize line endings and whitespace so re-uploads of the same resume hash identically
+def _resume_hash(resume_text):
+    lines = [" ".join(line.split()) for line in resume_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    normalized = "\n".join(line for line in lines if line)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+RESUME_TEMPLATE = """
+You are an expert resume parser. Extract the following structured information from the resume text below:
+- Professional skills
+- Work experience (with company, title, dates, and description)
+- Educational background (degree, institution, dates)
+- Achievements and certifications
+- Personal projects
+Return the result as a JSON object with keys: skills, experience, education, achievements, projects.
+
+Resume Text:
+{resume_text}
+"""
+
+# Built once per process and shared by every call
+@functools.lru_cache(maxsize=None)
+def resume_prompt():
+    from langchain.prompts import PromptTemplate
+    return PromptTemplate(input_variables=["resume_text"], template=RESUME_TEMPLATE)
+
+# Text of a chat model response or stream chunk
+def _message_text(message):
+    content = getattr(message, "content", None)
+    return content if isinstance(content, str) else str(message)
+
+# Helper function for LLM-based resume information extraction
+@traced("resume_extraction")
+def extract_resume_info_llm(resume_text):
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return {"error": "Groq API key not found. Please set GROQ_API_KEY in your environment."}
+    model_name = default_model_name()
+    cache_key = make_cache_key("resume", _resume_hash(resume_text), model_name, RESUME_PROMPT_VERSION)
+    cached = _resume_cache().get(cache_key)
+    # Unparsed output cached by earlier versions is retried rather than served
+    if cached is not None and "raw_output" not in cached:
+        return cached
+    try:
+        result = call_llm(resume_prompt(), {"resume_text": resume_text}, model_name)
+        output = _message_text(result)
+        fenced = _CODE_FENCE_RE.match(output)
+        try:
+            structured = json.loads(fenced.group(1) if fenced else output)
+        except Exception:
+            # Not cached, so the next request gets another chance at valid JSON
+            return {"raw_output": output}
+        structured = make_json_serializable(structured)
+        _resume_cache().set(cache_key, structured)
+        return structured
+    except Exception as e:
+        return {"error": str(e)}
+
+# Helper function for Google Custom Search API
+def search_company_info(company_name):
+    import requests
+    api_key = os.getenv("GOOGLE_CSE_API_KEY")
+    cx = os.getenv("GOOGLE_CSE_CX")
+    if not api_key or not cx:
+        return {"error": "Google Custom Search API key or CX not set in environment."}
+    params = {
+        "key": api_key,
+        "cx": cx,
+        "q": company_name,
+        "num": 5
+    }
+    try:
+        resp = requests.get("https://www.googleapis.com/customsearch/v1", params=params, timeout=10)
+        resp.raise_for_status()
+        data = resp.json()
+        results = []
+        for item in data.get("items", []):
+            results.append({
+                "title": item.get("title"),
+                "snippet": item.get("snippet"),
+                "link": item.get("link")
+            })
+        return {"results": results}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
+# One Tavily client per process, backed by a pooled HTTP session so concurrent
+# research queries reuse connections instead of opening new ones per call
+_tavily_client = None
+_research_executor = None
+_research_lock = threading.Lock()
+
+def _research_workers():
+    return int(os.getenv("TAVILY_MAX_WORKERS", "8"))
+
+def _get_tavily_client(api_key):
+    global _tavily_client
+    with _research_lock:
+        if _tavily_client is None or _tavily_client.api_key != api_key:
+            import requests
+            from tavily import TavilyClient
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_research_workers())
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _tavily_client = TavilyClient(api_key, api_base_url=os.getenv("TAVILY_API_BASE"), session=session)
+        return _tavily_client
+
+def _get_research_executor():
+    global _research_executor
+    with _research_lock:
+        if _research_executor is None:
+            _research_executor = ThreadPoolExecutor(max_workers=_research_workers(), thread_name_prefix="tavily")
+        return _research_executor
+
+def _tavily_query(api_key, query, max_results, timeout):
+    with span("tavily_query", query=query):
+        response = _get_tavily_client(api_key).search(query, max_results=max_results, timeout=timeout)
+        return response.get('results', [])
+
+# Send all (query, max_results) specs at once; each entry of the returned list is
+# either the raw Tavily results for that query or the exception it failed with.
+# `timeout` is the HTTP timeout of each query, so it runs from when a worker sends
+# the request and time spent queued behind other sessions' queries does not count.
+def _run_tavily_queries(api_key, specs, timeout=None):
+    if timeout is None:
+        timeout = float(os.getenv("TAVILY_QUERY_TIMEOUT", "15"))
+    executor = _get_research_executor()
+    futures = [submit(executor, _tavily_query, api_key, query, max_results, timeout) for query, max_results in specs]
+    responses = []
+    for future in futures:
+        try:
+            responses.append(future.result())
+        except Exception as e:
+            responses.append(e)
+    return responses
+
+def _overview_query(company_name):
+    return f"{company_name} company overview"
+
+def _project_queries(company_name):
+    return [
+        f"{company_name} ongoing projects",
+        f"{company_name} past projects"
+    ]
+
+def _vmg_queries(company_name):
+    return [
+        f"{company_name} vision mission goals",
+        f"{company_name} about us"
+    ]
+
+def _overview_results(items):
+    results = []
+    for item in items:
+        results.append({
+            "title": item.get("title"),
+            "snippet": item.get("content"),
+            "link": item.get("url")
+        })
+    return {"results": results}
+
+# Clean, deduplicate and cap snippets across the responses of several queries
+def _merge_snippets(responses, cap_len):
+    seen = set()
+    results = []
+    total_len = 0
+    for items in responses:
+        for item in items:
+            snippet = item.get("content", "") or ""
+            # Clean HTML tags and decode entities
+            snippet = _HTML_TAG_RE.sub('', snippet)
+            snippet = unescape(snippet)
+            snippet = snippet.strip()
+            # Deduplicate near-identical snippets
+            snippet_key = snippet[:100].lower()
+            if snippet and snippet_key not in seen:
+                seen.add(snippet_key)
+                if total_len + len(snippet) > cap_len:
+                    break
+                results.append(snippet[:400])
+                total_len += len(snippet)
+        if total_len > cap_len:
+            break
+    return results
+
+# Stored company profile for `company_name`, or None
+def _stored_profile(company_name):
+    if not store_enabled():
+        return None
+    profile = get_company_store().get(company_name)
+    record("company_store", outcome="hit" if profile else "miss")
+    return profile
+
+# Helper function for Tavily Search API
+def search_company_info_tavily(company_name):
+    profile = _stored_profile(company_name)
+    if profile and profile["overview"]:
+        return {"results": profile["overview"]}
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        return {"error": "Tavily API key not set in environment."}
+    query = _overview_query(company_name)
+    cache_key = _research_cache_key("overview", company_name, [query], 5)
+    cached = _research_cache().get(cache_key)
+    if cached is not None:
+        return cached
+    response = _run_tavily_queries(api_key, [(query, 5)])[0]
+    if isinstance(response, Exception):
+        return {"error": str(response)}
+    overview = _overview_results(response)
+    if overview["results"]:
+        _research_cache().set(cache_key, overview)
+    return overview
+
+def make_json_serializable(obj):
+    if isinstance(obj, dict):
+        return {k: make_json_serializable(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [make_json_serializable(v) for v in obj]
+    else:
+        try:
+            json.dumps(obj)
+            return obj
+        except TypeError:
+            return str(obj)
+
+def _safe_file_name(platform, idx):
+    slug = _WHITESPACE_RE.sub('_', platform).lower()
+    return f"outreach_{slug}_variant{idx}.txt"
+
+def _tavily_search(company_name, queries, cap_len=2000):
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        return []
+    cache_key = _research_cache_key("snippets", company_name, queries, cap_len)
+    cached = _research_cache().get(cache_key)
+    if cached is not None:
+        return cached
+    responses = _run_tavily_queries(api_key, [(query, 3) for query in queries])
+    results = _merge_snippets([r for r in responses if not isinstance(r, Exception)], cap_len)
+    # Only cache complete, non-empty results so transient failures are retried
+    if results and not any(isinstance(r, Exception) for r in responses):
+        _research_cache().set(cache_key, results)
+    return results
+
+# Helper function to extract company projects using Tavily
+def extract_company_projects(company_name):
+    profile = _stored_profile(company_name)
+    if profile and profile["projects"]:
+        return profile["projects"]
+    return _tavily_search(company_name, _project_queries(company_name), cap_len=2000)
+
+# Helper function to extract company vision, mission, and goals using Tavily
+def extract_company_vision_mission_goals(company_name):
+    profile = _stored_profile(company_name)
+    if profile and profile["vmg"]:
+        return profile["vmg"]
+    return _tavily_search(company_name, _vmg_queries(company_name), cap_len=1200)
+
+# Research stage: sends the overview, projects and vision/mission/goals queries
+# together, so wall time is bounded by the slowest query rather than their sum
+@traced("research")
+def research_company(company_name, timeout=None):
+    # Parts the local profile store has are served without touching the network;
+    # only the missing ones are researched
+    profile = _stored_profile(company_name)
+    research = {}
+    if profile:
+        stored = profile_to_research(profile)
+        research = {name: stored[name] for name in ("projects", "vmg") if stored[name]}
+        if stored["overview"]["results"]:
+            research["overview"] = stored["overview"]
+        if len(research) == 3:
+            return research
+    parts = [
+        ("overview", [_overview_query(company_name)], 5, 5),
+        ("projects", _project_queries(company_name), 3, 2000),
+        ("vmg", _vmg_queries(company_name), 3, 1200)
+    ]
+    parts = [part for part in parts if part[0] not in research]
+    api_key = os.getenv("TAVILY_API_KEY")
+    if not api_key:
+        research.setdefault("overview", {"error": "Tavily API key not set in environment."})
+        return {"overview": research["overview"], "projects": research.get("projects", []), "vmg": research.get("vmg", [])}
+    cache = _research_cache()
+    pending = []
+    for name, queries, max_results, limit in parts:
+        cache_key = _research_cache_key("overview" if name == "overview" else "snippets", company_name, queries, limit)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            research[name] = cached
+        else:
+            pending.append((name, queries, max_results, limit, cache_key))
+    specs = [(query, max_results) for _, queries, max_results, _, _ in pending for query in queries]
+    responses = _run_tavily_queries(api_key, specs, timeout) if specs else []
+    offset = 0
+    for name, queries, _, limit, cache_key in pending:
+        part_responses = responses[offset:offset + len(queries)]
+        offset += len(queries)
+        errors = [r for r in part_responses if isinstance(r, Exception)]
+        ok = [r for r in part_responses if not isinstance(r, Exception)]
+        if name == "overview":
+            value = {"error": str(errors[0])} if errors else _overview_results(ok[0])
+            complete = bool(value.get("results"))
+        else:
+            value = _merge_snippets(ok, limit)
+            complete = bool(value) and not errors
+        if complete:
+            cache.set(cache_key, value)
+        research[name] = value
+    research = {"overview": research["overview"], "projects": research["projects"], "vmg": research["vmg"]}
+    if store_enabled():
+        # A stored profile that was only missing parts keeps its source (and expiry rule)
+        get_company_store().put_research(company_name, research, source=profile["source"] if profile else "research")
+    return research
+
+RESUME_FILE_TYPES = {
+    ".pdf": PDF_TYPE,
+    ".docx": DOCX_TYPE,
+    ".txt": TXT_TYPE
+}
+
+# Helper function to extract plain text from an uploaded resume file (PDF, DOCX or TXT)
+def extract_resume_text(resume_file, file_type):
+    return extract_text(resume_file.read(), file_type)
+
+# Regression test for PromptTemplate input_variables
+def _test_prompt_template_vars():
+    for name, prompt in (("resume_prompt", resume_prompt()), ("generation_prompt", generation_prompt())):
+        input_vars = set(prompt.input_variables)
+        # Find all {var} in the template
+        found_vars = set(_TEMPLATE_VAR_RE.findall(prompt.template))
+        assert input_vars == found_vars, f"PromptTemplate {name} input_variables {input_vars} do not match template vars {found_vars}"
+
+# Error message for an unsupported tone, length or platform, or None when all are valid
+def validate_generation_options(tone, length, platform):
+    allowed_tones = ["formal", "enthusiastic", "conversational"]
+    allowed_lengths = ["short", "medium", "long"]
+    allowed_platforms = ["Email", "LinkedIn", "WhatsApp", "Twitter DM", "SMS"]
+    if tone not in allowed_tones:
+        return f"Invalid tone: {tone}. Allowed values are: {', '.join(allowed_tones)}."
+    if length not in allowed_lengths:
+        return f"Invalid length: {length}. Allowed values are: {', '.join(allowed_lengths)}."
+    if platform not in allowed_platforms:
+        return f"Invalid platform: {platform}. Allowed values are: {', '.join(allowed_platforms)}."
+    return None
+
+# Validate options and assemble the token-budgeted prompt, its inputs and the model for message generation
+def build_generation_request(resume_structured, company_name, company_description, tone, length, job_title, platform, platform_options, focus_areas, num_variants, company_projects=None, company_vmg=None):
+    invalid = validate_generation_options(tone, length, platform)
+    if invalid:
+        return {"error": invalid}
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return {"error": "Groq API key not found. Please set GROQ_API_KEY in your environment."}
+    request = build_generation_prompt(
+        make_json_serializable(resume_structured),
+        company_name,
+        company_description,
+        tone,
+        length,
+        job_title,
+        platform,
+        platform_options,
+        focus_areas,
+        num_variants,
+        company_projects=company_projects,
+        company_vmg=company_vmg
+    )
+    request["route"] = route_for(platform, length)
+    request["model"] = request["route"]["model"]
+    request["rules"] = platform_rules(platform, platform_options, num_variants)
+    # Everything that affects the output: the assembled prompt inputs, the template, the routed model and the platform rules
+    request["cache_key"] = make_cache_key("generation", request["inputs"], request["prompt"].template, request["model"], request["rules"])
+    return request
+
+def _generation_cache():
+    return get_cache(
+        "generation",
+        ttl=int(os.getenv("GENERATION_CACHE_TTL", "604800")),
+        max_entries=int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "10000"))
+    )
+
+# Run a request from build_generation_request, serving it from the generation cache when possible
+def _split_variants(result):
+    return [v.strip() for v in _VARIANT_SEPARATOR_RE.split(_message_text(result).strip()) if v.strip()]
+
+# Check variants against the platform rules, repairing only the ones that break them
+def _validated(request, variants):
+    def more(count):
+        result, _ = call_routed(request["route"], request["prompt"], dict(request["inputs"], num_variants=count))
+        return _split_variants(result)
+    return enforce(variants, request["rules"], request["route"], call_routed, more=more)
+
+def generate_from_request(request, force_regenerate=False):
+    if "error" in request:
+        return request
+    with span("generation", platform=request["inputs"]["platform"], model=request["model"]) as current:
+        try:
+            if not force_regenerate:
+                cached = _generation_cache().get(request["cache_key"])
+                if cached is not None:
+                    return dict(cached, cached=True)
+            result, model_used = call_routed(request["route"], request["prompt"], request["inputs"])
+            current.attrs["model"] = model_used
+            variants, validation = _validated(request, _split_variants(result))
+            generated = {"messages": variants, "prompt_tokens": request["prompt_tokens"], "model": model_used, "validation": validation}
+            if variants:
+                _generation_cache().set(request["cache_key"], generated)
+            return dict(generated, cached=False)
+        except Exception as e:
+            current.error = str(e)
+            return {"error": str(e)}
+
+def generate_platform_message(resume_structured, company_name, company_description, tone, length, job_title, platform, platform_options, focus_areas, num_variants, company_projects=None, company_vmg=None, force_regenerate=False):
+    try:
+        request = build_generation_request(resume_structured, company_name, company_description, tone, length, job_title, platform, platform_options, focus_areas, num_variants, company_projects=company_projects, company_vmg=company_vmg)
+    except Exception as e:
+        return {"error": str(e)}
+    return generate_from_request(request, force_regenerate)
+
+# Streaming counterpart of generate_from_request. Yields dicts as the model produces output:
+# {"token": ..., "partial": ...} for each chunk (partial is the variant in progress),
+# {"variant": ..., "index": ...} as soon as a variant's --- separator arrives,
+# then a final {"messages": [...], "prompt_tokens": ..., "cached": ...} or {"error": ...}
+def stream_from_request(request, force_regenerate=False):
+    if "error" in request:
+        yield request
+        return
+    with span("generation", platform=request["inputs"]["platform"], model=request["model"], streamed=True) as current:
+        try:
+            if not force_regenerate:
+                cached = _generation_cache().get(request["cache_key"])
+                if cached is not None:
+                    for idx, variant in enumerate(cached["messages"], start=1):
+                        yield {"variant": variant, "index": idx}
+                    yield dict(cached, cached=True)
+                    return
+            variants = []
+            current_lines = []
+            pending = ""
+            model_used = request["model"]
+            for model_used, chunk in stream_routed(request["route"], request["prompt"], request["inputs"]):
+                token = _message_text(chunk)
+                if not token:
+                    continue
+                pending += token
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    # Split only on lines that are exactly three dashes
+                    if line == "---":
+                        variant = "\n".join(current_lines).strip()
+                        current_lines = []
+                        if variant:
+                            variants.append(variant)
+                            yield {"variant": variant, "index": len(variants)}
+                    else:
+                        current_lines.append(line)
+                yield {"token": token, "partial": "\n".join(current_lines + [pending]).strip()}
+            if pending != "---":
+                current_lines.append(pending)
+            variant = "\n".join(current_lines).strip()
+            if variant:
+                variants.append(variant)
+                yield {"variant": variant, "index": len(variants)}
+            current.attrs["model"] = model_used
+            # Streamed variants were a preview; the final messages are the validated ones
+            variants, validation = _validated(request, variants)
+            generated = {"messages": variants, "prompt_tokens": request["prompt_tokens"], "model": model_used, "validation": validation}
+            if variants:
+                _generation_cache().set(request["cache_key"], generated)
+            yield dict(generated, cached=False)
+        except Exception as e:
+            current.error = str(e)
+            yield {"error": str(e)}
+
+def stream_platform_message(resume_structured, company_name, company_description, tone, length, job_title, platform, platform_options, focus_areas, num_variants, company_projects=None, company_vmg=None, force_regenerate=False):
+    try:
+        request = build_generation_request(resume_structured, company_name, company_description, tone, length, job_title, platform, platform_options, focus_areas, num_variants, company_projects=company_projects, company_vmg=company_vmg)
+    except Exception as e:
+        yield {"error": str(e)}
+        return
+    yield from stream_from_request(request, force_regenerate)
+
+# Run several prebuilt requests (platform -> request) concurrently with bounded concurrency
+def generate_from_requests(platform_requests, max_workers=None, force_regenerate=False):
+    if not platform_requests:
+        return {}
+    if max_workers is None:
+        max_workers = int(os.getenv("GENERATION_MAX_WORKERS", "3"))
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(platform_requests))), thread_name_prefix="generate") as executor:
+        futures = {platform: submit(executor, generate_from_request, request, force_regenerate) for platform, request in platform_requests.items()}
+        for platform, future in futures.items():
+            try:
+                results[platform] = future.result()
+            except Exception as e:
+                results[platform] = {"error": str(e)}
+    return results
+
+# Batch mode: fan one research result out to several platforms concurrently.
+# platform_options maps each platform to its own options; returns a dict of
+# platform -> {"messages": [...]} or {"error": ...}
+def generate_platform_messages(resume_structured, company_name, company_description, tone, length, job_title, platforms, platform_options, focus_areas, num_variants, company_projects=None, company_vmg=None, max_workers=None, force_regenerate=False):
+    platform_requests = {}
+    for platform in dict.fromkeys(platforms):
+        try:
+            platform_requests[platform] = build_generation_request(resume_structured, company_name, company_description, tone, length, job_title, platform, platform_options.get(platform, {}), focus_areas, num_variants, company_projects=company_projects, company_vmg=company_vmg)
+        except Exception as e:
+            platform_requests[platform] = {"error": str(e)}
+    return generate_from_requests(platform_requests, max_workers=max_workers, force_regenerate=force_regenerate)
+
+# Flatten a research_company result into the company context used for generation
+def company_context(research):
+    overview = research.get("overview", {})
+    results = overview.get("results") or []
+    return {
+        "company_description": (results[0].get("snippet") or "") if results else "",
+        "company_projects": research.get("projects", []),
+        "company_vmg": research.get("vmg", [])
+    }
@@ -0,0 +1,112 @@
+# Resume file ingestion: text extraction for PDF, DOCX and TXT uploads.
+# DOCX files are parsed in memory, large PDFs have their pages extracted in
+# parallel on a process pool, uploads are held to size and page limits, and
+# extracted text is cached by file hash so re-uploads and reruns skip parsing.
+import io
+import os
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from cache import get_cache, make_cache_key
+from metrics import span
+
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TXT_TYPE = "text/plain"
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+
+class ResumeIngestionError(ValueError):
+    pass
+
+
+def _max_bytes():
+    return int(os.getenv("RESUME_MAX_BYTES", str(10 * 1024 * 1024)))
+
+
+def _max_pages():
+    return int(os.getenv("RESUME_MAX_PAGES", "50"))
+
+
+def _text_cache():
+    return get_cache(
+        "resume_text",
+        ttl=int(os.getenv("RESUME_TEXT_CACHE_TTL", "2592000")),
+        max_entries=int(os.getenv("RESUME_TEXT_CACHE_MAX_ENTRIES", "2000"))
+    )
+
+
+def _pdf_workers():
+    return int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+# Spawned rather than forked: the Streamlit server process is multi-threaded
+def _get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=_pdf_workers(), mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+# Runs in a worker process: extract the text of pages [start, end)
+def _pdf_pages_text(data, start, end):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _extract_pdf(data):
+    import PyPDF2
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    if page_count > _max_pages():
+        raise ResumeIngestionError(f"PDF has {page_count} pages; the limit is {_max_pages()}.")
+    if page_count < int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8")):
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    pool = _get_pdf_pool()
+    chunk = max(1, -(-page_count // _pdf_workers()))
+    futures = [pool.submit(_pdf_pages_text, data, start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    return "\n".join(text for future in futures for text in future.result())
+
+
+def _extract_docx(data):
+    import docx2txt
+    # docx2txt reads the zip archive directly from a file-like object, no temp file needed
+    return docx2txt.process(io.BytesIO(data))
+
+
+def _extract_txt(data):
+    return data.decode("utf-8")
+
+
+_EXTRACTORS = {
+    PDF_TYPE: _extract_pdf,
+    DOCX_TYPE: _extract_docx,
+    TXT_TYPE: _extract_txt
+}
+
+
+# Extract plain text from resume file bytes of the given MIME type
+def extract_text(data, file_type):
+    if file_type not in _EXTRACTORS:
+        raise ResumeIngestionError(f"Unsupported file type: {file_type}")
+    if len(data) > _max_bytes():
+        raise ResumeIngestionError(f"Resume file is {len(data) // 1024} KB; the limit is {_max_bytes() // 1024} KB.")
+    with span("file_parsing", file_type=file_type, size=len(data)):
+        cache_key = make_cache_key("resume_text", hashlib.sha256(data).hexdigest(), file_type)
+        cached = _text_cache().get(cache_key)
+        if cached is not None:
+            return cached
+        try:
+            text = _EXTRACTORS[file_type](data)
+        except ResumeIngestionError:
+            raise
+        except Exception as e:
+            # Undecodable text or a corrupt PDF/DOCX is a bad upload, not a server fault
+            raise ResumeIngestionError(f"Could not read the resume file: {e}") from e
+        _text_cache().set(cache_key, text)
+        return text
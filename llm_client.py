@@ -0,0 +1,241 @@
+# Shared Groq client layer: one reused ChatGroq per model (keeping its HTTP
+# connections alive), token-bucket limits for the provider's requests-per-minute
+# and tokens-per-minute quotas, jittered exponential backoff on 429/5xx and a
+# deadline per call.
+import os
+import time
+import random
+import threading
+from dotenv import load_dotenv
+from prompt_builder import count_tokens
+from metrics import record
+
+load_dotenv()
+
+# Rough size of a completion, used to reserve TPM quota before the real usage is known
+COMPLETION_TOKENS_ESTIMATE = 500
+
+_models = {}
+_models_lock = threading.Lock()
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # Seconds until `amount` can be taken, reserving it immediately (the balance may go negative)
+    def reserve(self, amount):
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    # Return or charge the difference once the real token usage is known
+    def adjust(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, estimated_tokens, deadline=None):
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        if deadline is not None and time.monotonic() + wait > deadline:
+            # Give the reservation back; this call will not be made
+            if self.requests:
+                self.requests.adjust(-1)
+            if self.tokens:
+                self.tokens.adjust(-estimated_tokens)
+            raise LLMDeadlineExceeded("Groq rate limit wait would exceed the call deadline.")
+        if wait > 0:
+            time.sleep(wait)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        if self.tokens and actual_tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+def get_rate_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                int(os.getenv("GROQ_RPM_LIMIT", "30")),
+                int(os.getenv("GROQ_TPM_LIMIT", "30000"))
+            )
+        return _limiter
+
+
+def default_model_name():
+    return os.getenv("GROQ_MODEL", "llama3-8b-8192")
+
+
+# One ChatGroq per (key, model) for the whole process, so its HTTP connection pool is reused.
+# Retries are disabled on the client because call_llm owns them.
+def get_chat_model(model_name=None):
+    api_key = os.getenv("GROQ_API_KEY")
+    model_name = model_name or default_model_name()
+    key = (api_key, model_name)
+    with _models_lock:
+        if key not in _models:
+            from langchain_groq import ChatGroq
+            _models[key] = ChatGroq(
+                api_key=api_key,
+                model=model_name,
+                timeout=float(os.getenv("GROQ_TIMEOUT", "60")),
+                max_retries=0
+            )
+        return _models[key]
+
+
+def _retry_after(e):
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(e):
+    import groq
+    if isinstance(e, groq.APIConnectionError):
+        # Includes APITimeoutError
+        return True
+    status = getattr(e, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def _backoff_delay(attempt, e):
+    base = float(os.getenv("GROQ_BACKOFF_BASE", "1"))
+    cap = float(os.getenv("GROQ_BACKOFF_MAX", "30"))
+    # Full jitter keeps concurrent callers from retrying in lockstep
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    retry_after = _retry_after(e)
+    return max(delay, retry_after) if retry_after else delay
+
+
+def _deadline(deadline):
+    if deadline is None:
+        deadline = float(os.getenv("GROQ_CALL_DEADLINE", "120"))
+    return time.monotonic() + deadline
+
+
+def _token_usage(message):
+    metadata = getattr(message, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or {}
+    return usage.get("total_tokens")
+
+
+# Export prompt/completion token counts from a response or final stream chunk
+def _record_tokens(model_name, message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens")
+    completion_tokens = usage.get("output_tokens")
+    if prompt_tokens is None:
+        metadata = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+        prompt_tokens = metadata.get("prompt_tokens")
+        completion_tokens = metadata.get("completion_tokens")
+    record("prompt_tokens", prompt_tokens or 0, model=model_name)
+    record("completion_tokens", completion_tokens or 0, model=model_name)
+
+
+# `prompt | llm` for one attempt, with the HTTP timeout cut to what is left of the deadline
+def _attempt_chain(prompt, llm, deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise LLMDeadlineExceeded("Groq call deadline exceeded.")
+    return prompt | llm.bind(timeout=min(float(os.getenv("GROQ_TIMEOUT", "60")), remaining))
+
+
+def _acquire(limiter, estimated, deadline, model_name):
+    started = time.monotonic()
+    limiter.acquire(estimated, deadline)
+    record("rate_limit_wait_seconds", round(time.monotonic() - started, 3), model=model_name)
+
+
+def _record_retry(model_name, e):
+    record("llm_retries", model=model_name, status=getattr(e, "status_code", None) or type(e).__name__)
+
+
+# Run `prompt | model` with rate limiting and retries. `deadline` is the total
+# number of seconds the call may take, including waits and retries.
+def call_llm(prompt, inputs, model_name=None, deadline=None):
+    llm = get_chat_model(model_name)
+    model_name = llm.model_name
+    limiter = get_rate_limiter()
+    estimated = count_tokens(prompt.format(**inputs)) + COMPLETION_TOKENS_ESTIMATE
+    deadline = _deadline(deadline)
+    max_retries = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+    attempt = 0
+    while True:
+        _acquire(limiter, estimated, deadline, model_name)
+        try:
+            result = _attempt_chain(prompt, llm, deadline).invoke(inputs)
+        except Exception as e:
+            if not _is_retryable(e) or attempt >= max_retries:
+                raise
+            delay = _backoff_delay(attempt, e)
+            if time.monotonic() + delay > deadline:
+                raise
+            _record_retry(model_name, e)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        limiter.record_usage(estimated, _token_usage(result))
+        _record_tokens(model_name, result)
+        return result
+
+
+# Streaming counterpart of call_llm. Failures are retried only until the first
+# chunk arrives; after that the error is raised to the caller.
+def stream_llm(prompt, inputs, model_name=None, deadline=None):
+    llm = get_chat_model(model_name)
+    model_name = llm.model_name
+    limiter = get_rate_limiter()
+    estimated = count_tokens(prompt.format(**inputs)) + COMPLETION_TOKENS_ESTIMATE
+    deadline = _deadline(deadline)
+    max_retries = int(os.getenv("GROQ_MAX_RETRIES", "4"))
+    attempt = 0
+    while True:
+        _acquire(limiter, estimated, deadline, model_name)
+        started = False
+        try:
+            for chunk in _attempt_chain(prompt, llm, deadline).stream(inputs):
+                started = True
+                if getattr(chunk, "usage_metadata", None):
+                    _record_tokens(model_name, chunk)
+                yield chunk
+            return
+        except Exception as e:
+            if started or not _is_retryable(e) or attempt >= max_retries:
+                raise
+            delay = _backoff_delay(attempt, e)
+            if time.monotonic() + delay > deadline:
+                raise
+            _record_retry(model_name, e)
+            time.sleep(delay)
+            attempt += 1
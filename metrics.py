@@ -0,0 +1,234 @@
+# Per-request instrumentation: stage spans, token counts, cache hits and retries.
+# A trace groups everything recorded while handling one request (a Step 4 run,
+# a resume extraction, a batch row); process-wide aggregates are exported in
+# Prometheus text format and each finished trace can be logged as JSON.
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+import functools
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+logger = logging.getLogger("outreachcrafter.metrics")
+
+_current_trace = contextvars.ContextVar("outreach_trace", default=None)
+_lock = threading.Lock()
+_durations = {}
+_counters = {}
+_server = None
+
+
+class Trace:
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started = time.time()
+        self.duration_ms = None
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def add(self, name, value, labels):
+        key = name + "".join(f",{k}={v}" for k, v in sorted(labels.items()))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "trace_id": self.id,
+                "name": self.name,
+                "started": self.started,
+                "duration_ms": self.duration_ms,
+                "spans": list(self.spans),
+                "counters": dict(self.counters)
+            }
+
+
+class Span:
+    def __init__(self, stage, attrs):
+        self.stage = stage
+        self.attrs = attrs
+        self.error = None
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+# The trace logger, given a stderr handler at INFO on first use unless the
+# application has already configured one; none of the entry points set up logging
+def _trace_logger():
+    with _lock:
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    return logger
+
+
+# Group everything recorded inside the block under one trace; logs it as JSON on exit
+@contextmanager
+def start_trace(name):
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        _current_trace.reset(token)
+        if os.getenv("METRICS_JSON_LOG", "").lower() in ("1", "true", "yes"):
+            _trace_logger().info(json.dumps(trace.to_dict(), default=str))
+
+
+# Time a stage. Set `.error` on the yielded span when the stage fails without raising
+@contextmanager
+def span(stage, **attrs):
+    current = Span(stage, attrs)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        labels = {"stage": stage}
+        with _lock:
+            entry = _durations.setdefault(_label_key(labels), {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0, "errors": 0})
+            entry["sum"] += duration
+            entry["count"] += 1
+            entry["errors"] += 1 if current.error else 0
+            for idx, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    entry["buckets"][idx] += 1
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span({
+                "stage": stage,
+                "duration_ms": round(duration * 1000, 2),
+                "error": current.error,
+                **attrs
+            })
+
+
+# Decorator form of span; a returned {"error": ...} dict marks the span as failed
+def traced(stage):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage) as current:
+                result = fn(*args, **kwargs)
+                if isinstance(result, dict) and "error" in result:
+                    current.error = result["error"]
+                return result
+        return wrapper
+    return decorator
+
+
+# Increment a counter such as prompt_tokens, cache_hits or llm_retries
+def record(name, value=1, **labels):
+    if not value:
+        return
+    with _lock:
+        counters = _counters.setdefault(name, {})
+        key = _label_key(labels)
+        counters[key] = counters.get(key, 0) + value
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, value, labels)
+
+
+# Submit to an executor so the task records into the caller's trace
+def submit(executor, fn, *args, **kwargs):
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def snapshot():
+    with _lock:
+        return {
+            "durations": {dict(k)["stage"]: dict(v, buckets=list(v["buckets"])) for k, v in _durations.items()},
+            "counters": {name: [dict(labels=dict(k), value=v) for k, v in values.items()] for name, values in _counters.items()}
+        }
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels) + "}"
+
+
+def render_prometheus():
+    lines = [
+        "# HELP outreach_stage_duration_seconds Time spent per pipeline stage.",
+        "# TYPE outreach_stage_duration_seconds histogram"
+    ]
+    with _lock:
+        durations = {k: dict(v, buckets=list(v["buckets"])) for k, v in _durations.items()}
+        counters = {name: dict(values) for name, values in _counters.items()}
+    for labels, entry in sorted(durations.items()):
+        for bound, count in zip(DURATION_BUCKETS, entry["buckets"]):
+            lines.append(f"outreach_stage_duration_seconds_bucket{_format_labels(labels + (('le', bound),))} {count}")
+        lines.append(f"outreach_stage_duration_seconds_bucket{_format_labels(labels + (('le', '+Inf'),))} {entry['count']}")
+        lines.append(f"outreach_stage_duration_seconds_sum{_format_labels(labels)} {entry['sum']:.6f}")
+        lines.append(f"outreach_stage_duration_seconds_count{_format_labels(labels)} {entry['count']}")
+    lines.append("# HELP outreach_stage_errors_total Pipeline stage failures.")
+    lines.append("# TYPE outreach_stage_errors_total counter")
+    for labels, entry in sorted(durations.items()):
+        lines.append(f"outreach_stage_errors_total{_format_labels(labels)} {entry['errors']}")
+    for name, values in sorted(counters.items()):
+        lines.append(f"# TYPE outreach_{name}_total counter")
+        for labels, value in sorted(values.items()):
+            lines.append(f"outreach_{name}_total{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Serve /metrics (Prometheus text) and /metrics.json on a background thread; safe to call repeatedly
+def start_metrics_server(port=None):
+    global _server
+    port = port or os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    with _lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(snapshot()).encode("utf-8"), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        _server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), int(port)), Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, daemon=True, name="metrics").start()
+        return _server
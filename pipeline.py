@@ -0,0 +1,90 @@
+# Step 4 as a chain of memoized stages: research -> prompt -> generate -> render.
+# Each stage stores its output together with a hash of its own inputs in a
+# dict-like store (Streamlit session state in the UI) and is recomputed only
+# when those inputs change, so reruns triggered by widgets such as download
+# buttons cost no network calls.
+from cache import make_cache_key, normalize_company_name
+from core import (
+    research_company,
+    company_context,
+    build_generation_request,
+    generate_from_requests,
+    make_json_serializable
+)
+
+
+# Return the stored output of stage `name` if its inputs are unchanged, otherwise
+# recompute it. Outputs rejected by `keep` are not stored, so the next run retries.
+def run_stage(store, name, inputs, compute, force=False, keep=None):
+    key = make_cache_key(name, inputs)
+    entry = store.get(name)
+    if not force and entry is not None and entry["key"] == key:
+        return entry["output"]
+    output = compute()
+    if keep is None or keep(output):
+        store[name] = {"key": key, "output": output}
+    else:
+        store.pop(name, None)
+    return output
+
+
+# Company context for generation, plus "error" when the overview lookup failed
+def research_stage(store, company_name, research=research_company):
+    def compute():
+        result = research(company_name)
+        return dict(company_context(result), error=result.get("overview", {}).get("error"))
+    return run_stage(store, "research", {"company": normalize_company_name(company_name)}, compute, keep=lambda out: not out["error"])
+
+
+# One generation request per platform, built from the research output and message options
+def prompt_stage(store, resume_structured, company_name, context, tone, length, job_title, platforms, platform_options, focus_areas, num_variants):
+    inputs = {
+        "resume": make_json_serializable(resume_structured),
+        "company": company_name,
+        "context": context,
+        "tone": tone,
+        "length": length,
+        "job_title": job_title,
+        "platforms": platforms,
+        "platform_options": platform_options,
+        "focus_areas": focus_areas,
+        "num_variants": num_variants
+    }
+
+    def compute():
+        platform_requests = {}
+        for platform in dict.fromkeys(platforms):
+            try:
+                platform_requests[platform] = build_generation_request(
+                    resume_structured,
+                    company_name,
+                    context["company_description"],
+                    tone,
+                    length,
+                    job_title,
+                    platform,
+                    platform_options.get(platform, {}),
+                    focus_areas,
+                    num_variants,
+                    company_projects=context["company_projects"],
+                    company_vmg=context["company_vmg"]
+                )
+            except Exception as e:
+                platform_requests[platform] = {"error": str(e)}
+        return platform_requests
+    return run_stage(store, "prompt", inputs, compute)
+
+
+# Per-platform results for the prompt stage's requests. `generate` is called as
+# generate(platform_requests, force_regenerate=...) so the UI can stream instead.
+# Kept only if at least one platform succeeded.
+def generate_stage(store, platform_requests, force=False, generate=generate_from_requests):
+    inputs = {platform: request.get("cache_key") or request.get("error") for platform, request in platform_requests.items()}
+    return run_stage(
+        store,
+        "generate",
+        inputs,
+        lambda: generate(platform_requests, force_regenerate=force),
+        force=force,
+        keep=lambda out: any("error" not in result for result in out.values())
+    )
@@ -0,0 +1,96 @@
+# Speculative company research. The UI starts research in the background as
+# soon as Step 2 has a company name, so it runs while the user is still picking
+# message options; Step 4 then waits on the in-flight (or finished) job instead
+# of starting over. Jobs are shared per normalized company name across
+# sessions, and a job nobody is interested in any more is cancelled if it has
+# not started yet.
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import normalize_company_name
+from core import research_company
+from metrics import start_trace, record
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+class ResearchPrefetcher:
+    def __init__(self, max_workers=2, research=research_company):
+        self.research_fn = research
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._jobs = {}
+        self._interest = {}
+        self._lock = threading.Lock()
+
+    def _run(self, company_name):
+        with start_trace("prefetch"):
+            return self.research_fn(company_name)
+
+    def _done(self, key, future):
+        # Finished research lives in the persistent research cache; drop the job
+        # so a later lookup after an error starts a fresh attempt
+        with self._lock:
+            if self._jobs.get(key) is future:
+                del self._jobs[key]
+                self._interest.pop(key, None)
+
+    # Start researching `company_name` in the background unless a job for it is already running
+    def prefetch(self, company_name):
+        key = normalize_company_name(company_name)
+        if not key:
+            return None
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is None:
+                future = self._executor.submit(self._run, company_name)
+                self._jobs[key] = future
+                record("research_prefetch", outcome="started")
+            else:
+                record("research_prefetch", outcome="deduplicated")
+            self._interest[key] = self._interest.get(key, 0) + 1
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    # Withdraw one caller's interest; the job is cancelled if nobody else wants it and it
+    # is still queued. A job already running finishes and fills the research cache.
+    def cancel(self, company_name):
+        key = normalize_company_name(company_name)
+        with self._lock:
+            if key not in self._interest:
+                return False
+            self._interest[key] -= 1
+            if self._interest[key] > 0:
+                return False
+            future = self._jobs.pop(key)
+            del self._interest[key]
+        cancelled = future.cancel()
+        if cancelled:
+            record("research_prefetch", outcome="cancelled")
+        return cancelled
+
+    # Research result for `company_name`: waits for a prefetch in flight, otherwise researches now
+    def research(self, company_name):
+        key = normalize_company_name(company_name)
+        with self._lock:
+            future = self._jobs.get(key)
+        if future is not None and not future.cancelled():
+            record("research_prefetch", outcome="hit")
+            try:
+                return future.result()
+            except Exception as e:
+                return {"overview": {"error": str(e)}, "projects": [], "vmg": []}
+        return self.research_fn(company_name)
+
+
+def prefetch_enabled():
+    return os.getenv("RESEARCH_PREFETCH", "1").lower() not in ("0", "false", "no")
+
+
+# Shared prefetcher for the process, created on first use
+def get_prefetcher():
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = ResearchPrefetcher(max_workers=int(os.getenv("PREFETCH_MAX_WORKERS", "2")))
+        return _prefetcher
@@ -0,0 +1,197 @@
+# Model routing for message generation. A route table picks the model for
+# each platform and length (short-form SMS/Twitter DM go to a fast model,
+# long-form Email to the default one). Every call's latency is tracked per
+# model over a rolling window; a model whose recent p95 is over the route's
+# latency SLO is moved behind its fallback, and when the primary call runs past
+# the SLO a hedged request goes to the fallback and the first answer wins.
+import os
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from llm_client import call_llm, stream_llm, default_model_name
+from metrics import record, submit
+
+# First match wins; "*" matches any platform or length. "fast" and "default"
+# are aliases for GROQ_FAST_MODEL and GROQ_MODEL.
+DEFAULT_ROUTES = [
+    {"platform": "SMS", "length": "*", "model": "fast", "fallbacks": ["default"]},
+    {"platform": "Twitter DM", "length": "*", "model": "fast", "fallbacks": ["default"]},
+    {"platform": "WhatsApp", "length": "*", "model": "fast", "fallbacks": ["default"]},
+    {"platform": "*", "length": "short", "model": "fast", "fallbacks": ["default"]},
+    {"platform": "*", "length": "*", "model": "default", "fallbacks": ["fast"]}
+]
+
+# Samples needed before a model's rolling p95 is trusted for reordering
+MIN_SAMPLES = 5
+
+_routes = None
+_routes_lock = threading.Lock()
+_tracker = None
+_tracker_lock = threading.Lock()
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+class LatencyTracker:
+    def __init__(self, window=50):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model, seconds):
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, model):
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def stats(self):
+        with self._lock:
+            models = list(self._samples)
+        return {model: {"samples": len(self._samples[model]), "p95_s": self.p95(model)} for model in models}
+
+
+def get_latency_tracker():
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LatencyTracker(window=int(os.getenv("MODEL_LATENCY_WINDOW", "50")))
+        return _tracker
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv("MODEL_HEDGE_WORKERS", "16")), thread_name_prefix="route")
+        return _hedge_executor
+
+
+def _resolve(model):
+    if model == "default":
+        return default_model_name()
+    if model == "fast":
+        return os.getenv("GROQ_FAST_MODEL", "llama-3.1-8b-instant")
+    return model
+
+
+# Route table from the JSON file named by MODEL_ROUTES, or DEFAULT_ROUTES
+def get_routes():
+    global _routes
+    with _routes_lock:
+        if _routes is None:
+            path = os.getenv("MODEL_ROUTES")
+            if path:
+                with open(path, encoding="utf-8") as f:
+                    _routes = json.load(f)
+            else:
+                _routes = DEFAULT_ROUTES
+        return _routes
+
+
+# The route for a platform and length: {"model", "fallbacks", "slo_ms", "hedge"}
+def route_for(platform, length):
+    for entry in get_routes():
+        if entry.get("platform", "*") in ("*", platform) and entry.get("length", "*") in ("*", length):
+            break
+    else:
+        entry = {"model": "default", "fallbacks": []}
+    model = _resolve(entry["model"])
+    fallbacks = [m for m in dict.fromkeys(_resolve(f) for f in entry.get("fallbacks", [])) if m != model]
+    return {
+        "model": model,
+        "fallbacks": fallbacks,
+        "slo_ms": entry.get("slo_ms", int(os.getenv("MODEL_LATENCY_SLO_MS", "8000"))),
+        "hedge": entry.get("hedge", os.getenv("MODEL_HEDGING", "1").lower() not in ("0", "false", "no"))
+    }
+
+
+# Models to try in order: the primary first unless its recent p95 breaks the SLO
+# and a fallback is known (or not yet known) to be faster
+def candidate_models(route):
+    tracker = get_latency_tracker()
+    models = [route["model"]] + route["fallbacks"]
+    slo = route["slo_ms"] / 1000
+    primary_p95 = tracker.p95(route["model"])
+    if primary_p95 is None or primary_p95 <= slo:
+        return models
+    for model in route["fallbacks"]:
+        p95 = tracker.p95(model)
+        if p95 is None or p95 < primary_p95:
+            record("model_route", outcome="rerouted", model=model)
+            return [model] + [m for m in models if m != model]
+    return models
+
+
+def _timed_call(model, prompt, inputs, slo):
+    started = time.monotonic()
+    try:
+        result = call_llm(prompt, inputs, model)
+    except Exception:
+        # A failure counts as at least an SLO-length sample so an erroring model drifts back
+        get_latency_tracker().record(model, max(time.monotonic() - started, slo))
+        raise
+    get_latency_tracker().record(model, time.monotonic() - started)
+    return result, model
+
+
+# call_llm along a route. Returns (result, model that produced it). If the first
+# call has not answered within the SLO a hedged call goes to the next model;
+# on failure the next model is tried. The slower of two hedged calls is left
+# to finish in the background and its result discarded.
+def call_routed(route, prompt, inputs):
+    models = candidate_models(route)
+    slo = route["slo_ms"] / 1000
+    executor = _get_hedge_executor()
+    started = time.monotonic()
+    pending = {submit(executor, _timed_call, models.pop(0), prompt, inputs, slo)}
+    hedged = not route["hedge"]
+    error = None
+    while pending:
+        timeout = None if hedged or not models else max(0.0, slo - (time.monotonic() - started))
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            hedged = True
+            model = models.pop(0)
+            record("model_route", outcome="hedged", model=model)
+            pending.add(submit(executor, _timed_call, model, prompt, inputs, slo))
+            continue
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        if not pending and models:
+            model = models.pop(0)
+            record("model_route", outcome="fallback", model=model)
+            pending.add(submit(executor, _timed_call, model, prompt, inputs, slo))
+    raise error
+
+
+# Streaming counterpart of call_routed. Yields (model, chunk); a model that fails
+# before its first chunk is replaced by the next one. Streams are not hedged.
+def stream_routed(route, prompt, inputs):
+    models = candidate_models(route)
+    slo = route["slo_ms"] / 1000
+    tracker = get_latency_tracker()
+    for idx, model in enumerate(models):
+        started = time.monotonic()
+        streamed = False
+        try:
+            for chunk in stream_llm(prompt, inputs, model):
+                streamed = True
+                yield model, chunk
+        except Exception:
+            tracker.record(model, max(time.monotonic() - started, slo))
+            if streamed or idx == len(models) - 1:
+                raise
+            record("model_route", outcome="fallback", model=models[idx + 1])
+            continue
+        tracker.record(model, time.monotonic() - started)
+        return
@@ -0,0 +1,137 @@
+# Post-generation checks against platform rules: character limits, emoji
+# policy and variant count. Violations that can be fixed locally (stray emojis,
+# surplus variants) are fixed without a model call; over-length variants are
+# sent back individually with a short repair prompt, and only when that still
+# fails is the text cut at a word boundary.
+import os
+import re
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from metrics import record, span, submit
+
+# Character limits applied when platform_options has no max_length
+PLATFORM_CHAR_LIMITS = {
+    "SMS": 160,
+    "Twitter DM": 280
+}
+
+_EMOJI_RE = re.compile(
+    "[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U00002B00-\U00002BFF\U0001F1E6-\U0001F1FF\uFE0F\u200D]"
+)
+_SPACES_RE = re.compile(r"[ \t]{2,}")
+
+REPAIR_TEMPLATE = """Rewrite this {platform} message so that {instructions}. Keep its meaning, tone and key details. Output only the rewritten message, nothing else.
+
+Message:
+{message}"""
+
+
+@functools.lru_cache(maxsize=None)
+def repair_prompt():
+    from langchain.prompts import PromptTemplate
+    return PromptTemplate(input_variables=["platform", "instructions", "message"], template=REPAIR_TEMPLATE)
+
+
+# Rules a platform's variants must satisfy: {"platform", "max_length", "allow_emojis", "num_variants"}
+def platform_rules(platform, platform_options, num_variants):
+    platform_options = platform_options or {}
+    return {
+        "platform": platform,
+        "max_length": platform_options.get("max_length") or PLATFORM_CHAR_LIMITS.get(platform),
+        "allow_emojis": platform_options.get("use_emojis", True) is not False,
+        "num_variants": num_variants
+    }
+
+
+# Violations of one variant: {"too_long": chars over, "emojis": True}
+def check_variant(text, rules):
+    violations = {}
+    if rules["max_length"] and len(text) > rules["max_length"]:
+        violations["too_long"] = len(text) - rules["max_length"]
+    if not rules["allow_emojis"] and _EMOJI_RE.search(text):
+        violations["emojis"] = True
+    return violations
+
+
+def strip_emojis(text):
+    return _SPACES_RE.sub(" ", _EMOJI_RE.sub("", text)).strip()
+
+
+def truncate_to_limit(text, limit):
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    # Prefer a word boundary unless that would drop most of the message
+    head = cut.rsplit(None, 1)[0]
+    return (head if len(head) >= limit // 2 else cut).rstrip()
+
+
+def _repair(text, rules, route, call):
+    inputs = {
+        "platform": rules["platform"],
+        "instructions": f"it is at most {rules['max_length']} characters long (it is {len(text)} now)",
+        "message": text
+    }
+    result, _ = call(route, repair_prompt(), inputs)
+    content = getattr(result, "content", None)
+    return (content if isinstance(content, str) else str(result)).strip()
+
+
+# Returns (text, number of repair calls that produced text, 1 if it had to be truncated)
+def _fix_variant(text, rules, route, call):
+    violations = check_variant(text, rules)
+    if violations.get("emojis"):
+        record("validation_violations", platform=rules["platform"], rule="emojis")
+        text = strip_emojis(text)
+    if violations.get("too_long"):
+        record("validation_violations", platform=rules["platform"], rule="max_length")
+    repaired = 0
+    for _ in range(int(os.getenv("VALIDATION_MAX_REPAIRS", "1"))):
+        if not check_variant(text, rules).get("too_long"):
+            break
+        try:
+            rewritten = _repair(text, rules, route, call)
+        except Exception:
+            break
+        if rewritten:
+            text = rewritten if rules["allow_emojis"] else strip_emojis(rewritten)
+            repaired += 1
+    if check_variant(text, rules).get("too_long"):
+        return truncate_to_limit(text, rules["max_length"]), repaired, 1
+    return text, repaired, 0
+
+
+# Bring generated variants in line with `rules`. `call(route, prompt, inputs)` makes a
+# model call (routing.call_routed); `more(count)`, if given, generates `count` further
+# variants when too few came back. Returns (variants, {"repaired", "truncated", "dropped", "added"}).
+def enforce(variants, rules, route, call, more=None):
+    report = {"repaired": 0, "truncated": 0, "dropped": 0, "added": 0}
+    wanted = rules.get("num_variants")
+    if wanted and len(variants) > wanted:
+        report["dropped"] = len(variants) - wanted
+        variants = variants[:wanted]
+    elif wanted and len(variants) < wanted and more is not None:
+        record("validation_violations", platform=rules["platform"], rule="num_variants")
+        try:
+            extra = more(wanted - len(variants))[:wanted - len(variants)]
+        except Exception:
+            extra = []
+        report["added"] = len(extra)
+        variants = variants + extra
+    with span("validation", platform=rules["platform"]):
+        over_length = sum(1 for text in variants if check_variant(text, rules).get("too_long"))
+        if over_length > 1:
+            # Over-length variants are repaired concurrently, one short call each
+            with ThreadPoolExecutor(max_workers=over_length, thread_name_prefix="repair") as executor:
+                futures = [submit(executor, _fix_variant, text, rules, route, call) for text in variants]
+                outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [_fix_variant(text, rules, route, call) for text in variants]
+    for _, repaired, truncated in outcomes:
+        report["repaired"] += repaired
+        report["truncated"] += truncated
+    if report["repaired"]:
+        record("validation_repairs", report["repaired"], platform=rules["platform"])
+    if report["truncated"]:
+        record("validation_truncations", report["truncated"], platform=rules["platform"])
+    return [text for text, _, _ in outcomes], report